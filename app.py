@@ -1,13 +1,24 @@
 import os
+import io
+import json
+import shutil
 import logging
 import base64
-from flask import Flask, render_template, request, redirect, url_for, session, flash, make_response
+import tempfile
+import zipfile
+import uuid
+from datetime import datetime
+import click
+from flask import Flask, render_template, request, redirect, url_for, session, flash, make_response, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, insert, update, delete, inspect, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
 from functools import wraps
+from image_cache import ImageCache, content_hash
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -33,6 +44,13 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 # initialize the app with the extension, flask-sqlalchemy >= 3.0.x
 db.init_app(app)
 
+# Image cache shared by all workers on this host; a budget of 0 disables it
+app.config["IMAGE_CACHE_PATH"] = os.environ.get(
+    "IMAGE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "misionvictoriosa-imagenes.sqlite3")
+)
+app.config["IMAGE_CACHE_MAX_BYTES"] = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+image_cache = ImageCache(app.config["IMAGE_CACHE_PATH"], app.config["IMAGE_CACHE_MAX_BYTES"])
+
 def initialize_database():
     """Inicializa la base de datos y crea usuario admin si no existe"""
     try:
@@ -40,6 +58,23 @@ def initialize_database():
         db.create_all()
         app.logger.info("✓ Tablas de base de datos creadas/verificadas")
         
+        # Añadir columnas nuevas a tablas ya existentes (create_all no las altera).
+        # Cada worker ejecuta esto al arrancar, así que debe tolerar que otro
+        # proceso añada la misma columna al mismo tiempo.
+        for tabla, columna in (('proyectos', 'imagen_hash'), ('recursos', 'contenido_hash')):
+            if columna in {c['name'] for c in inspect(db.engine).get_columns(tabla)}:
+                continue
+            si_no_existe = 'IF NOT EXISTS ' if db.engine.dialect.name == 'postgresql' else ''
+            try:
+                db.session.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {si_no_existe}{columna} VARCHAR(64)"))
+                db.session.commit()
+                app.logger.info(f"✓ Columna {tabla}.{columna} añadida")
+            except DBAPIError:
+                db.session.rollback()
+                if columna not in {c['name'] for c in inspect(db.engine).get_columns(tabla)}:
+                    raise
+                app.logger.info(f"✓ Columna {tabla}.{columna} añadida por otro proceso")
+        
         # Importar modelos después de crear las tablas
         from models import Usuario
         
@@ -60,6 +95,22 @@ def initialize_database():
             app.logger.info("  Password: admin123")
         else:
             app.logger.info("✓ Usuario administrador ya existe")
+        
+        # Crear resúmenes faltantes para proyectos existentes
+        from models import Proyecto, ResumenProyecto
+        sin_resumen = db.session.scalars(
+            select(Proyecto.id).where(~Proyecto.resumen.has())
+        ).all()
+        # Otro worker puede estar generando los mismos resúmenes; uno por commit
+        # para que un conflicto de clave solo descarte ese proyecto
+        for proyecto_id in sin_resumen:
+            try:
+                ResumenProyecto.actualizar(proyecto_id)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+        if sin_resumen:
+            app.logger.info(f"✓ Resúmenes de proyectos verificados: {len(sin_resumen)}")
             
     except Exception as e:
         app.logger.error(f"Error inicializando la base de datos: {str(e)}")
@@ -98,64 +149,13 @@ def admin_required(f):
 @app.route('/')
 def index():
     """Home page with public sections"""
-    from models import Proyecto, Recurso
-    
-    # Get all projects for public display
-    projects = Proyecto.query.order_by(Proyecto.id.desc()).all()
+    from models import ResumenProyecto
     
-    # Convert BLOB images to base64 for display and get additional resources
-    projects_with_images = []
-    for project in projects:
-        project_dict = {
-            'id': project.id,
-            'titulo': project.titulo,
-            'descripcion': project.descripcion
-        }
-        
-        # Get main image (legacy)
-        if project.imagen:
-            image_data = base64.b64encode(project.imagen).decode('utf-8')
-            project_dict['imagen_base64'] = f"data:image/jpeg;base64,{image_data}"
-        else:
-            project_dict['imagen_base64'] = None
-        
-        # Get additional resources (images)
-        recursos = Recurso.query.filter_by(
-            proyecto_id=project.id, 
-            tipo='imagen'
-        ).order_by(Recurso.orden, Recurso.id).all()
-        
-        project_dict['recursos'] = []
-        for recurso in recursos:
-            if recurso.contenido:
-                resource_data = base64.b64encode(recurso.contenido).decode('utf-8')
-                project_dict['recursos'].append({
-                    'id': recurso.id,
-                    'nombre': recurso.nombre,
-                    'imagen_base64': f"data:image/jpeg;base64,{resource_data}",
-                    'orden': recurso.orden
-                })
-        
-        # Create combined images list (main image + resources)
-        project_dict['todas_imagenes'] = []
-        if project_dict['imagen_base64']:
-            project_dict['todas_imagenes'].append({
-                'id': 'main',
-                'nombre': 'Imagen principal',
-                'imagen_base64': project_dict['imagen_base64'],
-                'orden': -1
-            })
-        project_dict['todas_imagenes'].extend(project_dict['recursos'])
-        
-        # Get project characteristics for the index page
-        from models import Caracteristica
-        caracteristicas = Caracteristica.query.filter_by(proyecto_id=project.id).order_by(Caracteristica.orden, Caracteristica.id).limit(3).all()
-        project_dict['caracteristicas'] = caracteristicas
-        
-        projects_with_images.append(project_dict)
+    # Card data is precomputed on write; one narrow row per project
+    projects = ResumenProyecto.query.order_by(ResumenProyecto.proyecto_id.desc()).all()
     
     is_authenticated = 'user_id' in session
-    return render_template('index.html', projects=projects_with_images, is_authenticated=is_authenticated)
+    return render_template('index.html', projects=projects, is_authenticated=is_authenticated)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -264,7 +264,7 @@ def new_project():
                     orden += 1
         
         # Handle characteristics
-        from models import Caracteristica
+        from models import Caracteristica, ResumenProyecto
         
         # Get new characteristics
         textos_nuevos = request.form.getlist('caracteristica_texto_nueva')
@@ -285,6 +285,7 @@ def new_project():
                     db.session.add(caracteristica)
                     app.logger.info(f"Added characteristic: {caracteristica.texto} with icon {caracteristica.icono} and color {caracteristica.color}")
             
+            ResumenProyecto.actualizar(proyecto.id)
             db.session.commit()
             app.logger.info("Project and characteristics saved successfully")
             flash('Proyecto creado exitosamente.', 'success')
@@ -307,7 +308,7 @@ def edit_project(project_id):
     proyecto = Proyecto.query.get_or_404(project_id)
     
     if request.method == 'POST':
-        from models import Caracteristica
+        from models import Caracteristica, ResumenProyecto
         
         app.logger.info("=== EDIT PROJECT POST REQUEST ===")
         app.logger.info(f"Project ID: {project_id}")
@@ -327,6 +328,7 @@ def edit_project(project_id):
         proyecto.descripcion = descripcion
         
         # Update image if new one is uploaded
+        hash_anterior = proyecto.imagen_hash
         if imagen_file and imagen_file.filename and imagen_file.filename.strip():
             proyecto.imagen = imagen_file.read()
             app.logger.info(f"Updated main image, size: {len(proyecto.imagen)} bytes")
@@ -397,7 +399,10 @@ def edit_project(project_id):
                     db.session.add(caracteristica)
                     app.logger.info(f"Edit: Added new characteristic: {caracteristica.texto}")
             
+            ResumenProyecto.actualizar(project_id)
             db.session.commit()
+            if hash_anterior != proyecto.imagen_hash:
+                image_cache.invalidate(hash_anterior)
             app.logger.info("Project edit completed successfully")
             flash('Proyecto actualizado exitosamente.', 'success')
             return redirect(url_for('admin'))
@@ -450,11 +455,16 @@ def edit_project(project_id):
 @login_required
 def delete_project(project_id):
     """Delete project"""
-    from models import Proyecto
+    from models import Proyecto, Recurso
     
     proyecto = Proyecto.query.get_or_404(project_id)
+    hashes = db.session.scalars(
+        select(Recurso.contenido_hash).where(Recurso.proyecto_id == project_id)
+    ).all()
+    hashes.append(proyecto.imagen_hash)
     db.session.delete(proyecto)
     db.session.commit()
+    image_cache.invalidate(*hashes)
     
     flash('Proyecto eliminado exitosamente.', 'success')
     return redirect(url_for('admin'))
@@ -556,16 +566,72 @@ def serve_image(project_id):
     """Serve project image from database"""
     from models import Proyecto
     
+    # Resolve the cache key from the narrow hash column, never the blob
+    fila = db.session.execute(
+        select(Proyecto.imagen_hash).where(Proyecto.id == project_id)
+    ).first()
+    if fila is None:
+        return '', 404
+    
+    if fila.imagen_hash:
+        if fila.imagen_hash in request.if_none_match:
+            return _image_response(b'', fila.imagen_hash)
+        cached = image_cache.get(fila.imagen_hash)
+        if cached is not None:
+            return _image_response(cached, fila.imagen_hash)
+    
     proyecto = Proyecto.query.get_or_404(project_id)
     
     if proyecto.imagen:
-        response = make_response(proyecto.imagen)
-        response.headers['Content-Type'] = 'image/jpeg'
-        return response
+        if proyecto.imagen_hash is None:
+            # Row written before the hash column existed
+            proyecto.imagen_hash = content_hash(proyecto.imagen)
+            db.session.commit()
+        image_cache.put(proyecto.imagen_hash, proyecto.imagen)
+        return _image_response(proyecto.imagen, proyecto.imagen_hash)
     else:
         # Return a placeholder or 404
         return '', 404
 
+def _image_response(data, digest):
+    """Build an image response revalidated by its content hash"""
+    response = make_response(data)
+    response.headers['Content-Type'] = 'image/jpeg'
+    response.set_etag(digest)
+    return response.make_conditional(request)
+
+@app.route('/recurso/<int:recurso_id>/imagen')
+def serve_recurso_image(recurso_id):
+    """Serve resource image from database"""
+    from models import Recurso
+    
+    fila = db.session.execute(
+        select(Recurso.contenido_hash).where(Recurso.id == recurso_id)
+    ).first()
+    if fila is None:
+        return '', 404
+    
+    if fila.contenido_hash:
+        if fila.contenido_hash in request.if_none_match:
+            return _image_response(b'', fila.contenido_hash)
+        cached = image_cache.get(fila.contenido_hash)
+        if cached is not None:
+            return _image_response(cached, fila.contenido_hash)
+    
+    recurso = Recurso.query.get_or_404(recurso_id)
+    
+    if recurso.contenido_hash is None:
+        recurso.contenido_hash = content_hash(recurso.contenido)
+        db.session.commit()
+    image_cache.put(recurso.contenido_hash, recurso.contenido)
+    return _image_response(recurso.contenido, recurso.contenido_hash)
+
+@app.route('/admin/image-cache')
+@login_required
+def image_cache_stats():
+    """Shared image cache statistics (JSON)"""
+    return jsonify(image_cache.stats())
+
 @app.route('/proyecto/<int:project_id>')
 def project_detail(project_id):
     """View project details"""
@@ -626,13 +692,16 @@ def project_detail(project_id):
 @login_required
 def delete_recurso(recurso_id):
     """Delete a project resource"""
-    from models import Recurso
+    from models import Recurso, ResumenProyecto
     
     recurso = Recurso.query.get_or_404(recurso_id)
     project_id = recurso.proyecto_id
+    contenido_hash = recurso.contenido_hash
     
     db.session.delete(recurso)
+    ResumenProyecto.actualizar(project_id)
     db.session.commit()
+    image_cache.invalidate(contenido_hash)
     flash('Recurso eliminado exitosamente.', 'success')
     
     if project_id:
@@ -640,5 +709,312 @@ def delete_recurso(recurso_id):
     else:
         return redirect(url_for('admin'))
 
+@app.route('/admin/project/<int:project_id>/recursos', methods=['POST'])
+@login_required
+def update_recursos(project_id):
+    """Delete and reorder a project's resources in a single transaction (JSON)"""
+    from models import Proyecto, Recurso, ResumenProyecto
+    
+    Proyecto.query.get_or_404(project_id)
+    
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return jsonify({'success': False, 'error': 'Formato de datos inválido.'}), 400
+    eliminar = datos.get('eliminar', [])
+    orden = datos.get('orden', [])
+    
+    if not isinstance(eliminar, list) or not isinstance(orden, list) \
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in eliminar + orden):
+        return jsonify({'success': False, 'error': 'Formato de datos inválido.'}), 400
+    
+    hashes_proyecto = dict(db.session.execute(
+        select(Recurso.id, Recurso.contenido_hash).where(Recurso.proyecto_id == project_id)
+    ).all())
+    ids_proyecto = set(hashes_proyecto)
+    ids_eliminar = set(eliminar)
+    ids_ajenos = (ids_eliminar | set(orden)) - ids_proyecto
+    if ids_ajenos:
+        return jsonify({'success': False, 'error': 'Algunos recursos no pertenecen al proyecto.'}), 400
+    if ids_eliminar & set(orden):
+        return jsonify({'success': False, 'error': 'Un recurso no puede eliminarse y reordenarse a la vez.'}), 400
+    # A new ordering must list every remaining resource exactly once
+    if orden and (len(orden) != len(set(orden)) or set(orden) != ids_proyecto - ids_eliminar):
+        return jsonify({'success': False, 'error': 'El nuevo orden debe incluir cada imagen restante una sola vez.'}), 400
+    
+    try:
+        if ids_eliminar:
+            db.session.execute(
+                delete(Recurso)
+                .where(Recurso.proyecto_id == project_id, Recurso.id.in_(ids_eliminar))
+            )
+        if orden:
+            # Bulk UPDATE by primary key; positions start at 1 like new uploads
+            db.session.execute(
+                update(Recurso),
+                [{'id': recurso_id, 'orden': posicion} for posicion, recurso_id in enumerate(orden, start=1)]
+            )
+        ResumenProyecto.actualizar(project_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error updating resources for project {project_id}: {e}")
+        return jsonify({'success': False, 'error': 'Error al actualizar las imágenes.'}), 500
+    
+    image_cache.invalidate(*(hashes_proyecto[i] for i in ids_eliminar))
+    app.logger.info(f"Project {project_id}: deleted {len(ids_eliminar)} resources, reordered {len(orden)}")
+    return jsonify({
+        'success': True,
+        'eliminados': sorted(ids_eliminar),
+        'orden': orden
+    })
+
+# Catalog import/export (flask --app main export-catalog / import-catalog)
+CATALOG_VERSION = 1
+CATALOG_BATCH_SIZE = 100
+
+def _catalog_image_path(carpeta, row_id):
+    """Path of an image file inside the catalog archive"""
+    return f"imagenes/{carpeta}/{row_id}.jpg"
+
+def _write_catalog_line(manifest, registro):
+    """Append one JSON record to the manifest spool file"""
+    manifest.write(json.dumps(registro, ensure_ascii=False).encode('utf-8'))
+    manifest.write(b"\n")
+
+@app.cli.command('export-catalog')
+@click.argument('archivo', type=click.Path(dir_okay=False, writable=True))
+@click.option('--batch-size', default=CATALOG_BATCH_SIZE, show_default=True,
+              help='Rows fetched per round trip from the server-side cursor.')
+def export_catalog(archivo, batch_size):
+    """Export all projects, resources and characteristics to a zip archive"""
+    from models import Proyecto, Recurso, Caracteristica
+
+    totales = {'proyecto': 0, 'recurso': 0, 'caracteristica': 0}
+
+    # Read all three tables from one snapshot so no child row is exported
+    # without its project; SQLite transactions are already serializable.
+    nivel = 'REPEATABLE READ' if db.engine.dialect.name == 'postgresql' else 'SERIALIZABLE'
+    db.session.connection(execution_options={'isolation_level': nivel})
+
+    # Images go straight into the archive as rows arrive; the manifest is
+    # spooled to a temp file on disk and appended once every row is written.
+    with zipfile.ZipFile(archivo, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf, \
+            tempfile.TemporaryFile() as manifest:
+        _write_catalog_line(manifest, {
+            'tipo': 'catalogo',
+            'version': CATALOG_VERSION,
+            'id': uuid.uuid4().hex,
+        })
+
+        proyectos = db.session.execute(
+            select(Proyecto.id, Proyecto.titulo, Proyecto.descripcion,
+                   Proyecto.imagen, Proyecto.fecha_creacion)
+            .order_by(Proyecto.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in proyectos:
+            imagen = None
+            if row.imagen:
+                imagen = _catalog_image_path('proyectos', row.id)
+                zf.writestr(imagen, row.imagen)
+            _write_catalog_line(manifest, {
+                'tipo': 'proyecto',
+                'id': row.id,
+                'titulo': row.titulo,
+                'descripcion': row.descripcion,
+                'imagen': imagen,
+                'fecha_creacion': row.fecha_creacion.isoformat() if row.fecha_creacion else None,
+            })
+            totales['proyecto'] += 1
+
+        recursos = db.session.execute(
+            select(Recurso.id, Recurso.proyecto_id, Recurso.tipo, Recurso.nombre,
+                   Recurso.contenido, Recurso.orden, Recurso.fecha_creacion)
+            .order_by(Recurso.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in recursos:
+            contenido = _catalog_image_path('recursos', row.id)
+            zf.writestr(contenido, row.contenido)
+            _write_catalog_line(manifest, {
+                'tipo': 'recurso',
+                'id': row.id,
+                'proyecto_id': row.proyecto_id,
+                'tipo_recurso': row.tipo,
+                'nombre': row.nombre,
+                'contenido': contenido,
+                'orden': row.orden,
+                'fecha_creacion': row.fecha_creacion.isoformat() if row.fecha_creacion else None,
+            })
+            totales['recurso'] += 1
+
+        caracteristicas = db.session.execute(
+            select(Caracteristica.id, Caracteristica.proyecto_id, Caracteristica.texto,
+                   Caracteristica.icono, Caracteristica.color, Caracteristica.orden,
+                   Caracteristica.fecha_creacion)
+            .order_by(Caracteristica.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in caracteristicas:
+            _write_catalog_line(manifest, {
+                'tipo': 'caracteristica',
+                'id': row.id,
+                'proyecto_id': row.proyecto_id,
+                'texto': row.texto,
+                'icono': row.icono,
+                'color': row.color,
+                'orden': row.orden,
+                'fecha_creacion': row.fecha_creacion.isoformat() if row.fecha_creacion else None,
+            })
+            totales['caracteristica'] += 1
+
+        manifest.seek(0)
+        with zf.open('manifest.jsonl', 'w', force_zip64=True) as destino:
+            shutil.copyfileobj(manifest, destino)
+
+    click.echo(
+        f"✓ Catálogo exportado a {archivo}: {totales['proyecto']} proyectos, "
+        f"{totales['recurso']} recursos, {totales['caracteristica']} características"
+    )
+
+def _parse_catalog_date(valor):
+    return datetime.fromisoformat(valor) if valor else None
+
+@app.cli.command('import-catalog')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=CATALOG_BATCH_SIZE, show_default=True,
+              help='Rows inserted per bulk statement and commit.')
+def import_catalog(archivo, batch_size):
+    """Import a catalog archive produced by export-catalog.
+
+    Rows are bulk-inserted in batches and committed periodically. Each commit
+    also stores the import checkpoint (last manifest line and project id map)
+    in the same transaction, so re-running the command after an interruption
+    continues exactly where the last committed batch ended.
+    """
+    from models import Proyecto, Recurso, Caracteristica, ResumenProyecto, ImportacionCatalogo
+
+    totales = {'proyecto': 0, 'recurso': 0, 'caracteristica': 0}
+    modelos = {'proyecto': Proyecto, 'recurso': Recurso, 'caracteristica': Caracteristica}
+
+    with zipfile.ZipFile(archivo) as zf, zf.open('manifest.jsonl') as manifest:
+        lineas = io.TextIOWrapper(manifest, encoding='utf-8')
+
+        cabecera = json.loads(next(lineas, '{}'))
+        if cabecera.get('tipo') != 'catalogo' or not cabecera.get('id'):
+            raise click.ClickException("El archivo no contiene un manifiesto de catálogo válido")
+        if cabecera.get('version') != CATALOG_VERSION:
+            raise click.ClickException(f"Versión de catálogo no soportada: {cabecera.get('version')}")
+
+        importacion = db.session.get(ImportacionCatalogo, cabecera['id'])
+        if importacion is None:
+            importacion = ImportacionCatalogo(catalogo_id=cabecera['id'], linea=1, proyectos={})
+            db.session.add(importacion)
+            db.session.commit()
+        elif importacion.completada:
+            raise click.ClickException("Este catálogo ya fue importado en esta base de datos")
+        elif importacion.linea > 1:
+            click.echo(f"Reanudando importación desde la línea {importacion.linea + 1} del manifiesto")
+
+        # Exported project ids are remapped to the ids assigned in this database
+        mapa_proyectos = dict(importacion.proyectos)
+
+        def nuevo_proyecto_id(registro, numero):
+            proyecto_id = mapa_proyectos.get(str(registro['proyecto_id']))
+            if proyecto_id is None:
+                raise click.ClickException(
+                    f"Línea {numero}: el proyecto {registro['proyecto_id']} no está en el catálogo"
+                )
+            return proyecto_id
+
+        def guardar_lote(tipo, lote, ultima_linea):
+            filas = [fila for _, fila in lote]
+            if tipo == 'proyecto':
+                nuevos_ids = db.session.scalars(
+                    insert(Proyecto).returning(Proyecto.id, sort_by_parameter_order=True),
+                    filas,
+                ).all()
+                for (id_original, _), nuevo_id in zip(lote, nuevos_ids):
+                    mapa_proyectos[str(id_original)] = nuevo_id
+                afectados = set(nuevos_ids)
+            else:
+                db.session.execute(insert(modelos[tipo]), filas)
+                afectados = {fila['proyecto_id'] for fila in filas}
+            for proyecto_id in afectados:
+                ResumenProyecto.actualizar(proyecto_id)
+            # Checkpoint commits together with the batch it describes
+            importacion.linea = ultima_linea
+            importacion.proyectos = dict(mapa_proyectos)
+            db.session.commit()
+            totales[tipo] += len(filas)
+
+        lote, tipo_lote = [], None
+        numero = importacion.linea
+        for numero, linea in enumerate(lineas, start=2):
+            if numero <= importacion.linea:
+                continue
+            registro = json.loads(linea)
+            tipo = registro['tipo']
+            if tipo not in modelos:
+                raise click.ClickException(f"Línea {numero}: tipo de registro desconocido '{tipo}'")
+
+            if lote and (tipo != tipo_lote or len(lote) >= batch_size):
+                guardar_lote(tipo_lote, lote, numero - 1)
+                lote = []
+            tipo_lote = tipo
+
+            fila = {'fecha_creacion': _parse_catalog_date(registro.get('fecha_creacion'))}
+            if tipo == 'proyecto':
+                fila['titulo'] = registro['titulo']
+                fila['descripcion'] = registro['descripcion']
+                fila['imagen'] = zf.read(registro['imagen']) if registro.get('imagen') else None
+                fila['imagen_hash'] = content_hash(fila['imagen']) if fila['imagen'] else None
+            elif tipo == 'recurso':
+                fila['proyecto_id'] = nuevo_proyecto_id(registro, numero)
+                fila['tipo'] = registro['tipo_recurso']
+                fila['nombre'] = registro['nombre']
+                fila['contenido'] = zf.read(registro['contenido'])
+                fila['contenido_hash'] = content_hash(fila['contenido'])
+                fila['orden'] = registro['orden']
+            else:
+                fila['proyecto_id'] = nuevo_proyecto_id(registro, numero)
+                fila['texto'] = registro['texto']
+                fila['icono'] = registro['icono']
+                fila['color'] = registro['color']
+                fila['orden'] = registro['orden']
+            lote.append((registro['id'], fila))
+
+        if lote:
+            guardar_lote(tipo_lote, lote, numero)
+
+        importacion.completada = True
+        db.session.commit()
+
+    click.echo(
+        f"✓ Catálogo importado: {totales['proyecto']} proyectos, "
+        f"{totales['recurso']} recursos, {totales['caracteristica']} características"
+    )
+
+@app.cli.command('rebuild-summaries')
+@click.option('--batch-size', default=CATALOG_BATCH_SIZE, show_default=True,
+              help='Projects recomputed per commit.')
+def rebuild_summaries(batch_size):
+    """Recompute the card summary of every project"""
+    from models import Proyecto, ResumenProyecto
+
+    # Drop summaries whose project no longer exists (e.g. removed outside the app)
+    db.session.execute(
+        delete(ResumenProyecto).where(~ResumenProyecto.proyecto_id.in_(select(Proyecto.id)))
+    )
+
+    proyectos_ids = db.session.scalars(select(Proyecto.id).order_by(Proyecto.id)).all()
+    for i, proyecto_id in enumerate(proyectos_ids, start=1):
+        ResumenProyecto.actualizar(proyecto_id)
+        if i % batch_size == 0:
+            db.session.commit()
+    db.session.commit()
+
+    click.echo(f"✓ Resúmenes reconstruidos: {len(proyectos_ids)} proyectos")
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,247 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    """SHA-256 hex digest used as the image cache key and ETag"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImageCache:
+    """Image bytes cache shared by every worker process on the host.
+
+    Backed by a local SQLite file (WAL mode) so gunicorn workers reuse the
+    same entries instead of each holding its own copy. Entries are keyed by
+    the content hash stored next to each image in the database, so a
+    replaced image simply gets a new key and stale bytes are never served;
+    ``invalidate()`` only reclaims space early. Total blob size is kept
+    under ``max_bytes`` by evicting the least recently used entries.
+
+    Entry metadata and image bytes live in separate tables, and the total
+    size is a running counter, so eviction and stats never read blob pages.
+
+    Lookups never take the write lock: ``last_access`` is refreshed at most
+    every ``TOUCH_INTERVAL`` seconds per entry, and hit/miss counters are
+    kept per process and flushed every ``FLUSH_INTERVAL`` seconds.
+    """
+
+    TOUCH_INTERVAL = 30
+    FLUSH_INTERVAL = 10
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pendientes = {'hits': 0, 'misses': 0}
+        self._ultimo_flush = time.monotonic()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _connection(self):
+        """One connection per thread, reopened after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entradas (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entradas_last_access ON entradas (last_access);
+            CREATE TABLE IF NOT EXISTS datos (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stats (
+                nombre TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            );
+            -- Layout of earlier versions, with the blob inline
+            DROP TABLE IF EXISTS blobs;
+            DROP TABLE IF EXISTS refs;
+        """)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _incr(conn, nombre, cantidad=1):
+        conn.execute(
+            "INSERT INTO stats (nombre, valor) VALUES (?, ?) "
+            "ON CONFLICT (nombre) DO UPDATE SET valor = valor + excluded.valor",
+            (nombre, cantidad)
+        )
+
+    def _contar(self, nombre):
+        """Count a hit or miss locally and flush the counters when due"""
+        with self._lock:
+            self._pendientes[nombre] += 1
+            if time.monotonic() - self._ultimo_flush < self.FLUSH_INTERVAL:
+                return
+        self.flush_stats()
+
+    def flush_stats(self):
+        """Write this process' pending hit/miss counters to the shared file"""
+        with self._lock:
+            pendientes = {k: v for k, v in self._pendientes.items() if v}
+            self._pendientes = {'hits': 0, 'misses': 0}
+            self._ultimo_flush = time.monotonic()
+        if not pendientes:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for nombre, cantidad in pendientes.items():
+                    self._incr(conn, nombre, cantidad)
+        except sqlite3.Error as e:
+            # Keep the counts for the next flush
+            with self._lock:
+                for nombre, cantidad in pendientes.items():
+                    self._pendientes[nombre] += cantidad
+            logger.warning(f"Image cache stats flush failed: {e}")
+
+    def get(self, digest):
+        """Return the cached bytes for a content hash, or None on a miss"""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT d.data, e.last_access FROM entradas e JOIN datos d ON d.hash = e.hash "
+                "WHERE e.hash = ?",
+                (digest,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Image cache read failed for {digest}: {e}")
+            return None
+
+        if row is None:
+            self._contar('misses')
+            return None
+
+        ahora = time.time()
+        if ahora - row[1] > self.TOUCH_INTERVAL:
+            try:
+                conn.execute("UPDATE entradas SET last_access = ? WHERE hash = ?", (ahora, digest))
+            except sqlite3.OperationalError:
+                # Busy writer; the LRU position can wait for the next hit
+                pass
+        self._contar('hits')
+        return row[0]
+
+    def put(self, digest, data):
+        """Store image bytes under their content hash, evicting LRU entries over budget"""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                actualizada = conn.execute(
+                    "UPDATE entradas SET last_access = ? WHERE hash = ?", (time.time(), digest)
+                ).rowcount
+                if not actualizada:
+                    conn.execute(
+                        "INSERT INTO entradas (hash, size, last_access) VALUES (?, ?, ?)",
+                        (digest, len(data), time.time())
+                    )
+                    conn.execute("INSERT INTO datos (hash, data) VALUES (?, ?)", (digest, data))
+                    self._incr(conn, 'bytes', len(data))
+                    self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Image cache write failed for {digest}: {e}")
+
+    def _evict(self, conn):
+        """Drop least recently used blobs until the byte budget is met"""
+        row = conn.execute("SELECT valor FROM stats WHERE nombre = 'bytes'").fetchone()
+        exceso = (row[0] if row else 0) - self.max_bytes
+        if exceso <= 0:
+            return
+
+        expulsados, liberados = [], 0
+        for digest, size in conn.execute("SELECT hash, size FROM entradas ORDER BY last_access"):
+            expulsados.append(digest)
+            liberados += size
+            if liberados >= exceso:
+                break
+
+        self._delete(conn, expulsados)
+        self._incr(conn, 'bytes', -liberados)
+        self._incr(conn, 'evictions', len(expulsados))
+        self._incr(conn, 'evicted_bytes', liberados)
+
+    @staticmethod
+    def _delete(conn, digests):
+        parametros = [(d,) for d in digests]
+        conn.executemany("DELETE FROM entradas WHERE hash = ?", parametros)
+        conn.executemany("DELETE FROM datos WHERE hash = ?", parametros)
+
+    def invalidate(self, *digests):
+        """Reclaim space for images that were replaced or deleted"""
+        digests = [d for d in digests if d]
+        if not self.enabled or not digests:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                marcadores = ', '.join('?' * len(digests))
+                existentes = conn.execute(
+                    f"SELECT hash, size FROM entradas WHERE hash IN ({marcadores})", digests
+                ).fetchall()
+                self._delete(conn, [d for d, _ in existentes])
+                self._incr(conn, 'bytes', -sum(size for _, size in existentes))
+                self._incr(conn, 'invalidations', len(digests))
+        except sqlite3.Error as e:
+            logger.warning(f"Image cache invalidation failed for {digests}: {e}")
+
+    def stats(self):
+        """Hit ratio, eviction counters and current size.
+
+        Other workers' hits and misses appear once they flush, at most
+        ``FLUSH_INTERVAL`` seconds later.
+        """
+        resultado = {
+            'enabled': self.enabled,
+            'max_bytes': self.max_bytes,
+            'bytes': 0,
+            'entries': 0,
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'evicted_bytes': 0,
+            'invalidations': 0,
+            'hit_ratio': 0.0,
+        }
+        if not self.enabled:
+            return resultado
+
+        self.flush_stats()
+        try:
+            conn = self._connection()
+            resultado['entries'] = conn.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+            for nombre, valor in conn.execute("SELECT nombre, valor FROM stats"):
+                resultado[nombre] = valor
+        except sqlite3.Error as e:
+            logger.warning(f"Image cache stats read failed: {e}")
+            resultado['error'] = str(e)
+            return resultado
+
+        peticiones = resultado['hits'] + resultado['misses']
+        resultado['hit_ratio'] = resultado['hits'] / peticiones if peticiones else 0.0
+        return resultado
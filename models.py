@@ -1,5 +1,8 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import select, func
+from sqlalchemy.orm import validates
+from image_cache import content_hash
 import base64
 
 
@@ -21,12 +24,22 @@ class Proyecto(db.Model):
     titulo = db.Column(db.String(200), nullable=False)
     descripcion = db.Column(db.Text, nullable=False)
     imagen = db.Column(db.LargeBinary)
+    # SHA-256 of imagen, key of the shared image cache
+    imagen_hash = db.Column(db.String(64))
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship with recursos
     recursos = db.relationship('Recurso', backref='proyecto', cascade='all, delete-orphan')
     # Relationship with caracteristicas
     caracteristicas = db.relationship('Caracteristica', backref='proyecto', cascade='all, delete-orphan')
+    # Relationship with the denormalized card summary
+    resumen = db.relationship('ResumenProyecto', uselist=False, cascade='all, delete-orphan')
+    
+    @validates('imagen')
+    def _validate_imagen(self, key, value):
+        """Keep imagen_hash in step with every image write"""
+        self.imagen_hash = content_hash(value) if value else None
+        return value
     
     @property
     def imagen_base64(self):
@@ -69,9 +82,17 @@ class Recurso(db.Model):
     tipo = db.Column(db.String(50), nullable=False, default='imagen')
     nombre = db.Column(db.String(200), nullable=False)
     contenido = db.Column(db.LargeBinary, nullable=False)
+    # SHA-256 of contenido, key of the shared image cache
+    contenido_hash = db.Column(db.String(64))
     orden = db.Column(db.Integer, default=0)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @validates('contenido')
+    def _validate_contenido(self, key, value):
+        """Keep contenido_hash in step with every image write"""
+        self.contenido_hash = content_hash(value) if value else None
+        return value
+    
     @property
     def imagen_base64(self):
         """Convert image blob to base64 for display"""
@@ -93,3 +114,91 @@ class Caracteristica(db.Model):
     
     def __repr__(self):
         return f'<Caracteristica {self.texto}>'
+
+
+class ImportacionCatalogo(db.Model):
+    """Checkpoint of a catalog import, committed together with each batch"""
+    __tablename__ = 'importaciones_catalogo'
+    
+    catalogo_id = db.Column(db.String(32), primary_key=True)
+    # Last manifest line whose rows are committed
+    linea = db.Column(db.Integer, nullable=False, default=0)
+    # Exported project id (as string) -> id assigned in this database
+    proyectos = db.Column(db.JSON, nullable=False, default=dict)
+    completada = db.Column(db.Boolean, nullable=False, default=False)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ResumenProyecto(db.Model):
+    """Denormalized card data for the public project listing.
+
+    Kept in sync by the write routes through ``actualizar()`` inside the same
+    transaction as the change; ``flask rebuild-summaries`` recomputes all rows.
+    """
+    __tablename__ = 'resumen_proyectos'
+    
+    DESCRIPCION_CORTA = 120
+    MAX_CARACTERISTICAS = 3
+    
+    proyecto_id = db.Column(db.Integer, db.ForeignKey('proyectos.id', ondelete='CASCADE'), primary_key=True)
+    titulo = db.Column(db.String(200), nullable=False)
+    descripcion_corta = db.Column(db.String(DESCRIPCION_CORTA + 3), nullable=False)
+    # Cover image: 'proyecto' (main image) or 'recurso' (first additional image)
+    portada_tipo = db.Column(db.String(20))
+    portada_id = db.Column(db.Integer)
+    total_imagenes = db.Column(db.Integer, nullable=False, default=0)
+    caracteristicas = db.Column(db.JSON, nullable=False, default=list)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @classmethod
+    def actualizar(cls, proyecto_id):
+        """Recompute the summary of a project in the current session (no commit)"""
+        db.session.flush()
+        
+        proyecto = db.session.execute(
+            select(
+                Proyecto.titulo,
+                Proyecto.descripcion,
+                (func.coalesce(func.length(Proyecto.imagen), 0) > 0).label('tiene_imagen')
+            ).where(Proyecto.id == proyecto_id)
+        ).first()
+        resumen = db.session.get(cls, proyecto_id)
+        
+        if proyecto is None:
+            if resumen:
+                db.session.delete(resumen)
+            return None
+        
+        recursos_ids = db.session.scalars(
+            select(Recurso.id)
+            .where(Recurso.proyecto_id == proyecto_id, Recurso.tipo == 'imagen')
+            .order_by(Recurso.orden, Recurso.id)
+        ).all()
+        caracteristicas = db.session.execute(
+            select(Caracteristica.texto, Caracteristica.icono, Caracteristica.color)
+            .where(Caracteristica.proyecto_id == proyecto_id)
+            .order_by(Caracteristica.orden, Caracteristica.id)
+            .limit(cls.MAX_CARACTERISTICAS)
+        ).all()
+        
+        if resumen is None:
+            resumen = cls(proyecto_id=proyecto_id)
+            db.session.add(resumen)
+        
+        descripcion = proyecto.descripcion
+        if len(descripcion) > cls.DESCRIPCION_CORTA:
+            descripcion = descripcion[:cls.DESCRIPCION_CORTA] + '...'
+        
+        resumen.titulo = proyecto.titulo
+        resumen.descripcion_corta = descripcion
+        if proyecto.tiene_imagen:
+            resumen.portada_tipo, resumen.portada_id = 'proyecto', proyecto_id
+        elif recursos_ids:
+            resumen.portada_tipo, resumen.portada_id = 'recurso', recursos_ids[0]
+        else:
+            resumen.portada_tipo, resumen.portada_id = None, None
+        resumen.total_imagenes = int(proyecto.tiene_imagen) + len(recursos_ids)
+        resumen.caracteristicas = [
+            {'texto': c.texto, 'icono': c.icono, 'color': c.color} for c in caracteristicas
+        ]
+        return resumen